@@ -1,21 +1,30 @@
-import pandas as pd
 import time
 import logging
 import csv
 from pathlib import Path
 from datetime import datetime
 import threading
+import queue
+import numpy as np
 from flight_controller_module.gps_data import GPSDataProcessor
 
+FLIGHT_COLUMNS = [
+    'Timestamp', 'Symbol', 'Symbol_ID', 'Confidence', 'GPS_Lat', 'GPS_Lon', 
+    'GPS_Alt', 'Image_Path', 'Detection_X', 'Detection_Y', 
+    'Detection_W', 'Detection_H'
+]
+
 class ExcelLogger:
     def __init__(self, output_dir):
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(parents=True, exist_ok=True)
         
         self.logger = logging.getLogger('ExcelLogger')
-        self.data_buffer = []
-        self.csv_buffer = []
-        self.buffer_lock = threading.Lock()
+        
+        # Очередь детекций для фонового потока записи
+        # (SimpleQueue реализована на C и не берет Python-блокировку на put)
+        self.write_queue = queue.SimpleQueue()
+        self.batch_size = 1000
         
         # GPS процессор для форматирования
         self.gps_processor = GPSDataProcessor()
@@ -25,31 +34,52 @@ class ExcelLogger:
         
         self.competition_csv_file = self.create_competition_csv()
         
+        # Запуск потока записи на диск
+        self.writer_thread = threading.Thread(target=self.writer_loop)
+        self.writer_thread.daemon = True
+        self.writer_thread.start()
+        
     def create_flight_file(self):
         """Создание файла для текущего полета"""
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"flight_{timestamp}.xlsx"
+        filename = f"flight_{timestamp}.csv"
         filepath = self.output_dir / filename
         
-        # Создание начального Excel файла с заголовками
-        columns = [
-            'Timestamp', 'Symbol', 'Symbol_ID', 'Confidence', 'GPS_Lat', 'GPS_Lon', 
-            'GPS_Alt', 'Image_Path', 'Detection_X', 'Detection_Y', 
-            'Detection_W', 'Detection_H'
-        ]
-        
-        df = pd.DataFrame(columns=columns)
-        df.to_excel(filepath, index=False)
+        # Рабочий лог полета - CSV, открыт на весь полет (xlsx создается при закрытии)
+        self._flight_rows = []
+        self._csv_fh = open(filepath, 'w', newline='', encoding='utf-8')
+        self._csv_writer = csv.writer(self._csv_fh)
+        self._csv_writer.writerow(FLIGHT_COLUMNS)
+        self._csv_fh.flush()
         
         self.logger.info(f"Created flight data file: {filename}")
         return filepath
         
+    def save_flight_file(self):
+        """Сохранение лога текущего полета в Excel (однократно)"""
+        try:
+            self._csv_fh.close()
+            
+            # pandas нужен только при закрытии - не замедляем старт системы
+            import pandas as pd
+            
+            # Строки полета уже в памяти - CSV повторно не разбираем
+            xlsx_file = self.current_flight_file.with_suffix('.xlsx')
+            df = pd.DataFrame(self._flight_rows, columns=FLIGHT_COLUMNS)
+            df.to_excel(xlsx_file, index=False)
+            
+            self.logger.info(f"Saved flight data file: {xlsx_file.name}")
+            
+        except Exception as e:
+            self.logger.error(f"Error saving flight file: {e}")
+            
     def create_competition_csv(self):
         csv_filename = "objects-coordinates.csv"
         csv_filepath = self.output_dir / csv_filename
         
-        with open(csv_filepath, 'w', newline='', encoding='utf-8') as csvfile:
-            pass
+        # Файл открыт на весь полет, запись через буферизованный csv.writer
+        self._comp_fh = open(csv_filepath, 'w', newline='', encoding='utf-8', buffering=1 << 20)
+        self._comp_writer = csv.writer(self._comp_fh, lineterminator='\n')
             
         self.logger.info(f"Created competition CSV file: {csv_filename}")
         return csv_filepath
@@ -60,103 +90,150 @@ class ExcelLogger:
         try:
             x, y, w, h = detection_bbox
             
-            detection_data = {
-                'Timestamp': datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S.%f')[:-3],
-                'Symbol': symbol,
-                'Symbol_ID': symbol_id,
-                'Confidence': round(confidence, 3),
-                'GPS_Lat': round(gps_lat, 8),
-                'GPS_Lon': round(gps_lon, 8),
-                'GPS_Alt': round(gps_alt, 2),
-                'Image_Path': image_path,
-                'Detection_X': x,
-                'Detection_Y': y,
-                'Detection_W': w,
-                'Detection_H': h
-            }
+            # Проверка типов до постановки в очередь: некорректная детекция
+            # отбрасывается здесь и не ломает форматирование всей пачки
+            timestamp = float(timestamp)
+            confidence = float(confidence)
+            gps_lat = float(gps_lat)
+            gps_lon = float(gps_lon)
+            gps_alt = float(gps_alt)
             
-            with self.buffer_lock:
-                self.data_buffer.append(detection_data)
-                
-                if symbol_id is not None:
-                    lat_e7, lon_e7 = self.gps_processor.format_for_competition(gps_lat, gps_lon)
-                    
-                    competition_entry = {
-                        'symbol_id': symbol_id,
-                        'lat_e7': lat_e7,
-                        'lon_e7': lon_e7
-                    }
-                    self.csv_buffer.append(competition_entry)
-                
-            # Периодическое сохранение
-            if len(self.data_buffer) >= 5:  # Каждые 5 детекций
-                self.flush_to_excel()
-                self.flush_to_competition_csv()
+            # Сырые значения; округление и форматирование - пачкой в потоке записи
+            self.write_queue.put((
+                timestamp, symbol, symbol_id, confidence, gps_lat, gps_lon, gps_alt,
+                image_path, x, y, w, h
+            ))
                 
             self.logger.info(f"Logged detection: {symbol} (ID: {symbol_id}) at ({gps_lat:.6f}, {gps_lon:.6f})")
             
         except Exception as e:
             self.logger.error(f"Error logging detection: {e}")
             
-    def flush_to_excel(self):
-        """Сохранение буфера в Excel файл"""
-        try:
-            with self.buffer_lock:
-                if not self.data_buffer:
-                    return
-                    
-                # Читаем существующий файл
+    def writer_loop(self):
+        """Цикл фоновой записи детекций пачками"""
+        running = True
+        while running:
+            item = self.write_queue.get()
+            batch = []
+            
+            # Забираем все, что накопилось, но не больше batch_size
+            while item is not None:
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
                 try:
-                    existing_df = pd.read_excel(self.current_flight_file)
-                except:
-                    existing_df = pd.DataFrame()
+                    item = self.write_queue.get_nowait()
+                except queue.Empty:
+                    break
                     
-                # Добавляем новые данные
-                new_df = pd.DataFrame(self.data_buffer)
-                combined_df = pd.concat([existing_df, new_df], ignore_index=True)
+            if item is None:  # Сигнал завершения
+                running = False
                 
-                # Сохраняем обратно
-                combined_df.to_excel(self.current_flight_file, index=False)
+            if batch:
+                self.flush_to_excel(batch)
+                self.flush_to_competition_csv([entry for entry in batch if entry[2] is not None])
                 
-                self.logger.info(f"Flushed {len(self.data_buffer)} detections to Excel")
-                self.data_buffer.clear()
+    def flush_to_excel(self, entries):
+        """Дозапись пачки детекций в CSV лог полета"""
+        try:
+            if not entries:
+                return
                 
+            (timestamps, symbols, symbol_ids, confidences, lats, lons, alts,
+             image_paths, xs, ys, ws, hs) = zip(*entries)
+            
+            # Форматирование всей пачки за один проход
+            rows = list(zip(
+                [datetime.fromtimestamp(t).isoformat(sep=' ', timespec='milliseconds') for t in timestamps],
+                symbols, symbol_ids,
+                np.round(confidences, 3).tolist(),
+                np.round(lats, 8).tolist(),
+                np.round(lons, 8).tolist(),
+                np.round(alts, 2).tolist(),
+                image_paths, xs, ys, ws, hs
+            ))
+            
+            # Дописываем только новые строки, без перечитывания файла
+            self._csv_writer.writerows(rows)
+            self._csv_fh.flush()
+            self._flight_rows.extend(rows)
+                
+            self.logger.info(f"Flushed {len(entries)} detections to flight log")
+            
         except Exception as e:
             self.logger.error(f"Error flushing to Excel: {e}")
             
-    def flush_to_competition_csv(self):
+    def flush_to_competition_csv(self, entries):
         try:
-            with self.buffer_lock:
-                if not self.csv_buffer:
-                    return
-                    
-                with open(self.competition_csv_file, 'a', newline='', encoding='utf-8') as csvfile:
-                    for entry in self.csv_buffer:
-                        csvfile.write(f"{entry['symbol_id']},{entry['lat_e7']},{entry['lon_e7']}\n")
-                        
-                self.logger.info(f"Flushed {len(self.csv_buffer)} entries to competition CSV")
-                self.csv_buffer.clear()
+            if not entries:
+                return
                 
+            symbol_ids = [entry[2] for entry in entries]
+            lat_e7, lon_e7 = self.gps_processor.format_for_competition_batch(
+                [entry[4] for entry in entries], [entry[5] for entry in entries]
+            )
+            self._comp_writer.writerows(zip(symbol_ids, lat_e7.tolist(), lon_e7.tolist()))
+            self._comp_fh.flush()
+                    
+            self.logger.info(f"Flushed {len(entries)} entries to competition CSV")
+            
         except Exception as e:
             self.logger.error(f"Error flushing to competition CSV: {e}")
             
+    def read_flight_logs(self, files):
+        """Чтение CSV логов всех полетов в один DataFrame"""
+        import pandas as pd
+        
+        # Импорт pyarrow с fallback
+        try:
+            import pyarrow as pa
+            import pyarrow.csv as pacsv
+        except ImportError:
+            pa = None
+            self.logger.warning("pyarrow not available, summary report will use pandas CSV reader")
+            
+        all_data = []
+        
+        if pa is not None:
+            # Явные типы, чтобы схемы разных полетов совпадали при concat_tables
+            column_types = {
+                'Timestamp': pa.string(), 'Symbol': pa.string(), 'Symbol_ID': pa.int64(),
+                'Confidence': pa.float64(), 'GPS_Lat': pa.float64(), 'GPS_Lon': pa.float64(),
+                'GPS_Alt': pa.float64(), 'Image_Path': pa.string(),
+                'Detection_X': pa.int64(), 'Detection_Y': pa.int64(),
+                'Detection_W': pa.int64(), 'Detection_H': pa.int64()
+            }
+            # Пустые строки -> null, как в pd.read_csv (иначе '' считается символом)
+            convert_options = pacsv.ConvertOptions(column_types=column_types, strings_can_be_null=True)
+            
+        for file in files:
+            try:
+                if pa is not None:
+                    all_data.append(pacsv.read_csv(file, convert_options=convert_options))
+                else:
+                    all_data.append(pd.read_csv(file))
+            except Exception as e:
+                self.logger.error(f"Error reading {file}: {e}")
+                
+        if not all_data:
+            return None
+            
+        if pa is not None:
+            return pa.concat_tables(all_data).to_pandas()
+        return pd.concat(all_data, ignore_index=True)
+        
     def create_summary_report(self):
         """Создание сводного отчета"""
         try:
-            all_files = list(self.output_dir.glob("flight_*.xlsx"))
+            import pandas as pd
+            
+            all_files = list(self.output_dir.glob("flight_*.csv"))
             if not all_files:
                 return
                 
-            all_data = []
-            for file in all_files:
-                try:
-                    df = pd.read_excel(file)
-                    all_data.append(df)
-                except Exception as e:
-                    self.logger.error(f"Error reading {file}: {e}")
+            combined_df = self.read_flight_logs(all_files)
                     
-            if all_data:
-                combined_df = pd.concat(all_data, ignore_index=True)
+            if combined_df is not None:
                 
                 # Статистика
                 summary = {
@@ -182,7 +259,10 @@ class ExcelLogger:
             
     def close(self):
         """Закрытие логгера"""
-        self.flush_to_excel()
-        self.flush_to_competition_csv()
+        # Дожидаемся записи всех детекций из очереди
+        self.write_queue.put(None)
+        self.writer_thread.join()
+        self._comp_fh.close()
+        self.save_flight_file()
         self.create_summary_report()
         self.logger.info("Excel logger closed")
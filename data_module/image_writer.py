@@ -0,0 +1,62 @@
+import cv2
+import os
+import logging
+import threading
+import queue
+
+class ImageWriter:
+    def __init__(self, max_queue=100, jpeg_quality=85):
+        self.logger = logging.getLogger('ImageWriter')
+        self.encode_params = [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality]
+        self.write_queue = queue.Queue(maxsize=max_queue)
+        
+        # Запуск потока кодирования и записи изображений
+        self.writer_thread = threading.Thread(target=self.writer_loop)
+        self.writer_thread.daemon = True
+        self.writer_thread.start()
+        
+    def save(self, path, image):
+        """Постановка изображения в очередь на запись"""
+        try:
+            # Копия области: срез-представление удерживал бы в очереди весь кадр
+            self.write_queue.put_nowait((path, image.copy()))
+            return True
+        except queue.Full:
+            self.logger.warning(f"Image queue full, dropping {path}")
+            return False
+            
+    def writer_loop(self):
+        """Цикл фоновой записи изображений"""
+        while True:
+            item = self.write_queue.get()
+            if item is None:
+                break
+                
+            path, image = item
+            self.write_image(path, image)
+            
+    def write_image(self, path, image):
+        """Кодирование в JPEG и запись на диск"""
+        try:
+            ok, buf = cv2.imencode('.jpg', image, self.encode_params)
+            if not ok:
+                self.logger.error(f"JPEG encoding failed: {path}")
+                return
+                
+            # Запись буфера кодера напрямую в дескриптор, без промежуточных копий
+            data = memoryview(buf).cast('B')
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+            try:
+                while data:
+                    data = data[os.write(fd, data):]
+            finally:
+                os.close(fd)
+                
+        except Exception as e:
+            self.logger.error(f"Error writing image {path}: {e}")
+            
+    def close(self):
+        """Дозапись очереди и остановка потока"""
+        self.write_queue.put(None)
+        self.writer_thread.join()
+        self.logger.info("Image writer closed")
@@ -1,6 +1,39 @@
 import time
 import math
 import logging
+import numpy as np
+
+EARTH_RADIUS_M = 6371000  # Радиус Земли в метрах
+
+def _haversine(lat1, lon1, lat2, lon2):
+    """Формула гаверсинусов (компилируется numba при первом вызове)"""
+    lat1_rad = math.radians(lat1)
+    lat2_rad = math.radians(lat2)
+    delta_lat = math.radians(lat2 - lat1)
+    delta_lon = math.radians(lon2 - lon1)
+    
+    a = (math.sin(delta_lat/2) * math.sin(delta_lat/2) + 
+         math.cos(lat1_rad) * math.cos(lat2_rad) * 
+         math.sin(delta_lon/2) * math.sin(delta_lon/2))
+    
+    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
+    return EARTH_RADIUS_M * c
+
+# numba импортируется и компилирует _haversine при первом расчете расстояния
+# (импорт модуля на старте системы остается быстрым)
+_haversine_impl = None
+
+def _get_haversine():
+    """Отложенная JIT-компиляция _haversine с fallback на чистый Python"""
+    global _haversine_impl
+    if _haversine_impl is None:
+        try:
+            from numba import njit
+            _haversine_impl = njit(cache=True, fastmath=True)(_haversine)
+        except ImportError:
+            _haversine_impl = _haversine
+            logging.warning("numba not available, GPS distance math will run without JIT")
+    return _haversine_impl
 
 class GPSDataProcessor:
     
@@ -30,29 +63,38 @@ class GPSDataProcessor:
         return True
         
     def format_for_competition(self, lat, lon):
-        lat_e7 = int(round(lat * 1e7))
-        lon_e7 = int(round(lon * 1e7))
+        """Перевод одной точки в формат конкурса (×1e7, округление от нуля)"""
+        lat_e7 = int(lat * 1e7 + math.copysign(0.5, lat))
+        lon_e7 = int(lon * 1e7 + math.copysign(0.5, lon))
+        
+        return lat_e7, lon_e7
+        
+    def format_for_competition_batch(self, lats, lons):
+        """Векторный перевод массивов координат в формат конкурса (то же округление)"""
+        lat_scaled = np.asarray(lats, dtype=np.float64) * 1e7
+        lon_scaled = np.asarray(lons, dtype=np.float64) * 1e7
+        lat_e7 = np.trunc(lat_scaled + np.copysign(0.5, lat_scaled)).astype(np.int64)
+        lon_e7 = np.trunc(lon_scaled + np.copysign(0.5, lon_scaled)).astype(np.int64)
         
         return lat_e7, lon_e7
         
     def calculate_distance_meters(self, lat1, lon1, lat2, lon2):
         """Расчет расстояния между GPS точками в метрах"""
-        # Формула гаверсинусов
-        R = 6371000  # Радиус Земли в метрах
+        return _get_haversine()(float(lat1), float(lon1), float(lat2), float(lon2))
         
-        lat1_rad = math.radians(lat1)
-        lat2_rad = math.radians(lat2)
-        delta_lat = math.radians(lat2 - lat1)
-        delta_lon = math.radians(lon2 - lon1)
+    def haversine_batch(self, lat1, lon1, lat2, lon2):
+        """Векторный расчет расстояний между массивами GPS точек в метрах"""
+        lat1_rad = np.radians(lat1)
+        lat2_rad = np.radians(lat2)
+        delta_lat = lat2_rad - lat1_rad
+        delta_lon = np.radians(np.asarray(lon2) - np.asarray(lon1))
         
-        a = (math.sin(delta_lat/2) * math.sin(delta_lat/2) + 
-             math.cos(lat1_rad) * math.cos(lat2_rad) * 
-             math.sin(delta_lon/2) * math.sin(delta_lon/2))
+        a = (np.sin(delta_lat / 2) ** 2 + 
+             np.cos(lat1_rad) * np.cos(lat2_rad) * np.sin(delta_lon / 2) ** 2)
         
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-        distance = R * c
+        c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
         
-        return distance
+        return EARTH_RADIUS_M * c
         
     def is_within_accuracy(self, detected_lat, detected_lon, actual_lat, actual_lon, 
                           max_error_meters=10):
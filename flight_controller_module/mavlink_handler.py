@@ -15,8 +15,18 @@ class MAVLinkHandler:
         self.logger = logging.getLogger('MAVLink')
         self.connection = None
         self.connected = False
+        # Снимок GPS данных: писатель заменяет ссылку целиком (атомарно под GIL),
+        # поэтому читателю блокировка не нужна
         self.last_gps_data = None
-        self.data_lock = threading.Lock()
+        # Состояние ARMED и время HEARTBEAT автопилота (заменяются одной ссылкой)
+        self.armed_state = (False, 0.0)
+        
+        # Таблица обработчиков сообщений по типу
+        self._handlers = {
+            'GLOBAL_POSITION_INT': self._on_global_position_int,
+            'GPS_RAW_INT': self._on_gps_raw_int,
+            'HEARTBEAT': self._on_heartbeat
+        }
         
     def connect(self):
         """Подключение к полетному контроллеру"""
@@ -62,10 +72,12 @@ class MAVLinkHandler:
         """Цикл чтения данных от полетного контроллера"""
         while self.connected:
             try:
-                msg = self.connection.recv_match(blocking=False, timeout=1)
-                if msg:
-                    self.process_message(msg)
-                time.sleep(0.01)  # 100 Hz
+                # Блокирующее чтение: поток просыпается по приходу сообщения,
+                # таймаут нужен только для проверки флага connected
+                msg = self.connection.recv_match(blocking=True, timeout=0.5)
+                if msg is None:
+                    continue
+                self.process_message(msg)
                 
             except Exception as e:
                 self.logger.error(f"Error reading telemetry: {e}")
@@ -74,53 +86,68 @@ class MAVLinkHandler:
                 
     def process_message(self, msg):
         """Обработка сообщений от полетного контроллера"""
+        msg_type = msg.get_type()
         try:
-            if msg.get_type() == 'GLOBAL_POSITION_INT':
-                with self.data_lock:
-                    self.last_gps_data = {
-                        'lat': msg.lat / 1e7,
-                        'lon': msg.lon / 1e7,
-                        'alt': msg.alt / 1000.0,
-                        'relative_alt': msg.relative_alt / 1000.0,
-                        'vx': msg.vx / 100.0,
-                        'vy': msg.vy / 100.0,
-                        'vz': msg.vz / 100.0,
-                        'hdg': msg.hdg / 100.0,
-                        'timestamp': time.time(),
-                        'fix_quality': 3  
-                    }
-                    
-            elif msg.get_type() == 'GPS_RAW_INT':
-                # Дополнительная информация о GPS
-                if hasattr(msg, 'fix_type'):
-                    with self.data_lock:
-                        if self.last_gps_data:
-                            self.last_gps_data['fix_quality'] = msg.fix_type
-                            self.last_gps_data['satellites_visible'] = getattr(msg, 'satellites_visible', 0)
-                            
+            handler = self._handlers.get(msg_type)
+            if handler:
+                handler(msg)
+                
         except Exception as e:
-            self.logger.error(f"Error processing message {msg.get_type()}: {e}")
+            self.logger.error(f"Error processing message {msg_type}: {e}")
+            
+    def _on_global_position_int(self, msg):
+        """Обработка GLOBAL_POSITION_INT"""
+        self.last_gps_data = {
+            'lat': msg.lat / 1e7,
+            'lon': msg.lon / 1e7,
+            'alt': msg.alt / 1000.0,
+            'relative_alt': msg.relative_alt / 1000.0,
+            'vx': msg.vx / 100.0,
+            'vy': msg.vy / 100.0,
+            'vz': msg.vz / 100.0,
+            'hdg': msg.hdg / 100.0,
+            'timestamp': time.time(),
+            'fix_quality': 3  
+        }
+        
+    def _on_gps_raw_int(self, msg):
+        """Обработка GPS_RAW_INT (дополнительная информация о GPS)"""
+        if hasattr(msg, 'fix_type'):
+            gps = self.last_gps_data
+            if gps:
+                # Copy-on-write: опубликованный снимок не изменяется
+                gps = dict(gps)
+                gps['fix_quality'] = msg.fix_type
+                gps['satellites_visible'] = getattr(msg, 'satellites_visible', 0)
+                self.last_gps_data = gps
+                
+    def _on_heartbeat(self, msg):
+        """Обработка HEARTBEAT (состояние ARMED)"""
+        # Учитывается только автопилот: HEARTBEAT от GCS, подвеса, бортового
+        # компьютера и т.п. не должен менять состояние ARMED
+        if msg.get_srcSystem() != self.connection.target_system:
+            return
+        if (msg.type == mavutil.mavlink.MAV_TYPE_GCS or
+                msg.autopilot == mavutil.mavlink.MAV_AUTOPILOT_INVALID):
+            return
             
+        armed = bool(msg.base_mode & mavutil.mavlink.MAV_MODE_FLAG_SAFETY_ARMED)
+        self.armed_state = (armed, time.time())
+        
     def get_current_gps(self):
         """Получение текущих GPS координат"""
-        with self.data_lock:
-            if self.last_gps_data and \
-               time.time() - self.last_gps_data['timestamp'] < 5.0:
-                return self.last_gps_data.copy()
-            return None
+        gps = self.last_gps_data
+        if gps and time.time() - gps['timestamp'] < 5.0:
+            return gps.copy()
+        return None
             
     def is_armed(self):
-        """Проверка состояния ARMED дрона"""
-        if not self.connected or mavutil is None:
-            return False
-            
-        try:
-            msg = self.connection.recv_match(type='HEARTBEAT', blocking=False)
-            if msg:
-                return msg.base_mode & mavutil.mavlink.MAV_MODE_FLAG_SAFETY_ARMED
-            return False
-        except:
-            return False
+        """Проверка состояния ARMED дрона (по последнему HEARTBEAT из потока телеметрии)"""
+        armed, timestamp = self.armed_state
+        
+        # HEARTBEAT автопилота приходит с частотой 1 Гц: без него дольше 3 с
+        # состояние считается неизвестным (не ARMED)
+        return self.connected and armed and time.time() - timestamp < 3.0
             
     def is_connected(self):
         """Проверка подключения"""
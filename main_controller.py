@@ -14,6 +14,7 @@ from vision_module.ocr_processor import ArmenianOCRProcessor
 from flight_controller_module.mavlink_handler import MAVLinkHandler
 from flight_controller_module.gps_data import GPSDataProcessor
 from data_module.excel_logger import ExcelLogger
+from data_module.image_writer import ImageWriter
 from utils.config import Config
 
 class DroneVisionController:
@@ -39,6 +40,7 @@ class DroneVisionController:
         self.mavlink = None
         self.gps_processor = None
         self.logger = None
+        self.image_writer = None
         
     def setup_logging(self):
         """Настройка системы логирования"""
@@ -100,6 +102,10 @@ class DroneVisionController:
             self.logger = ExcelLogger(self.sd_path / "detections")
             self.system_logger.info("Data logger initialized")
             
+            # Инициализация фоновой записи изображений
+            self.image_writer = ImageWriter()
+            self.system_logger.info("Image writer initialized")
+            
             return True
             
         except Exception as e:
@@ -150,6 +156,11 @@ class DroneVisionController:
             except Exception as e:
                 self.system_logger.error(f"Frame processing error: {e}")
                 
+        # libtesseract освобождается потоком, который его использует, - только после
+        # выхода из цикла (не из обработчика сигнала во время распознавания)
+        if self.ocr:
+            self.ocr.close()
+            
     def process_single_frame(self, frame, timestamp, gps_data):
         """Обработка одного кадра"""
         try:
@@ -159,24 +170,29 @@ class DroneVisionController:
                 return
                 
             # Детекция символов на кадре
-            detections = self.detector.detect_symbols(frame)
+            detections, gray = self.detector.detect_symbols(frame)
             
             if not detections:
                 return
                 
             self.system_logger.info(f"Found {len(detections)} potential symbols")
             
+            # Извлечение областей с символами из кадра в оттенках серого
+            # (конвертация цвета уже выполнена детектором)
+            symbol_regions = [
+                self.detector.extract_symbol_region(gray, detection)
+                for detection in detections
+            ]
+            
+            # OCR распознавание всех областей кадра одним вызовом
+            ocr_results = self.ocr.recognize_batch(symbol_regions)
+            
             # Обработка каждой детекции
-            for i, detection in enumerate(detections):
+            for i, (detection, ocr_result) in enumerate(zip(detections, ocr_results)):
                 try:
-                    # Извлечение области с символом
-                    symbol_region = self.detector.extract_symbol_region(frame, detection)
-                    
-                    # OCR распознавание
-                    ocr_result = self.ocr.recognize_armenian_text(symbol_region)
-                    
                     if ocr_result['confidence'] > self.config.min_confidence:
-                        # Сохранение изображения
+                        # Сохранение цветного изображения только для принятых детекций
+                        symbol_region = self.detector.extract_symbol_region(frame, detection)
                         img_filename = f"detection_{timestamp}_{i}.jpg"
                         img_path = self.save_detection_image(symbol_region, img_filename)
                         
@@ -212,9 +228,11 @@ class DroneVisionController:
             img_dir.mkdir(exist_ok=True)
             
             img_path = img_dir / filename
-            import cv2
-            cv2.imwrite(str(img_path), image)
             
+            # Кодирование и запись выполняются в фоновом потоке
+            if not self.image_writer.save(img_path, image):
+                return ""
+                
             return str(img_path.relative_to(self.sd_path))
             
         except Exception as e:
@@ -240,6 +258,8 @@ class DroneVisionController:
         # Основной цикл захвата кадров
         frame_count = 0
         last_status_time = time.time()
+        last_frame_time = 0.0
+        frame_interval = 1.0 / self.config.target_fps
         
         try:
             while self.running:
@@ -264,19 +284,33 @@ class DroneVisionController:
                     time.sleep(1)
                     continue
                     
+                # Контроль частоты кадров: темп задает камера, лишние кадры
+                # пропускаются без декодирования и предобработки
+                if current_time - last_frame_time < frame_interval:
+                    self.camera.skip_frame()
+                    continue
+                    
                 self.set_status_led("active")
                 
                 # Захват кадра
                 frame = self.camera.capture_frame()
                 if frame is None:
                     continue
+                last_frame_time = current_time
                     
                 # Добавление в очередь обработки
                 timestamp = current_time
                 try:
                     self.processing_queue.put_nowait((frame, timestamp, gps_data))
                 except queue.Full:
-                    self.system_logger.warning("Processing queue full, dropping frame")
+                    # Отбрасываем самый старый кадр, чтобы обрабатывать свежие
+                    try:
+                        self.processing_queue.get_nowait()
+                        self.processing_queue.task_done()
+                    except queue.Empty:
+                        pass
+                    self.processing_queue.put_nowait((frame, timestamp, gps_data))
+                    self.system_logger.warning("Processing queue full, dropped oldest frame")
                     
                 frame_count += 1
                 
@@ -289,9 +323,6 @@ class DroneVisionController:
                     )
                     last_status_time = current_time
                     
-                # Контроль частоты кадров
-                time.sleep(1.0 / self.config.target_fps)
-                
         except KeyboardInterrupt:
             self.system_logger.info("Keyboard interrupt received")
         except Exception as e:
@@ -320,6 +351,8 @@ class DroneVisionController:
                 self.mavlink.close()
             if self.logger:
                 self.logger.close()
+            if self.image_writer:
+                self.image_writer.close()
         except Exception as e:
             self.system_logger.error(f"Error during shutdown: {e}")
             
@@ -1,8 +1,12 @@
 import json
+import copy
 import logging
 from pathlib import Path
 
 class Config:
+    # Кэш разобранных файлов настроек: (путь, mtime, размер) -> словарь
+    _cache = {}
+    
     def __init__(self, config_path="/home/khadas/drone-cv/config/settings.json"):
         self.config_path = Path(config_path)
         self.logger = logging.getLogger('Config')
@@ -12,8 +16,16 @@ class Config:
         """Загрузка конфигурации"""
         try:
             if self.config_path.exists():
-                with open(self.config_path, 'r', encoding='utf-8') as f:
-                    self.config = json.load(f)
+                stat = self.config_path.stat()
+                key = (str(self.config_path), stat.st_mtime_ns, stat.st_size)
+                cached = Config._cache.get(key)
+                if cached is None:
+                    with open(self.config_path, 'r', encoding='utf-8') as f:
+                        cached = json.load(f)
+                    Config._cache[key] = cached
+                    
+                # Копия, чтобы изменения одного экземпляра не попадали в кэш
+                self.config = copy.deepcopy(cached)
             else:
                 self.config = self.get_default_config()
                 self.save_config()
@@ -36,17 +48,21 @@ class Config:
                 "focus": 50,
                 "apply_preprocessing": True,
                 "auto_exposure": True,
-                "enhance_sharpness": True
+                "enhance_sharpness": True,
+                "use_opencl": True
             },
             "detection_config": {
                 "min_symbol_area": 2000,    # Для символов 3x3 метра
-                "max_symbol_area": 100000   # Верхний предел
+                "max_symbol_area": 100000,  # Верхний предел
+                "detection_scale": 0.5,     # Масштаб маски для морфологии
+                "coarse_scale": 0.25       # Масштаб грубого прохода (поиск областей)
             },
             "ocr_config": {
                 "model_name": "hye",
                 "fallback_model": "hye",
                 "engine_mode": 1,           # LSTM режим
-                "psm_mode": 8              # Одно слово
+                "psm_mode": 8,             # Одно слово
+                "target_height": 100       # Высота области для OCR, px
             },
             "mavlink_config": {
                 "connection_string": "/dev/ttyUSB0",
@@ -2,12 +2,36 @@ import cv2
 import numpy as np
 import time
 import logging
+import threading
 
 class CameraHandler:
     def __init__(self, config):
         self.config = config
         self.camera = None
         self.logger = logging.getLogger('CameraHandler')
+        
+        # Рабочий буфер размытия для unsharp mask (выделяется по размеру кадра)
+        self._blur_buf = None
+        
+        # CLAHE создается один раз и переиспользуется для каждого кадра
+        self._clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8))
+        
+        # Предобработка через OpenCL (T-API), если устройство поддерживается.
+        # setUseOpenCL - глобальная настройка OpenCV для всего процесса (влияет и на
+        # детектор, и на OCR), поэтому здесь она только включается, но не выключается:
+        # при use_opencl=False камера просто не использует UMat
+        self.use_opencl = self.config.get('use_opencl', True) and cv2.ocl.haveOpenCL()
+        if self.use_opencl:
+            cv2.ocl.setUseOpenCL(True)
+        
+        # Двойной буфер кадров, заполняемый потоком чтения камеры
+        self._buffers = [None, None]
+        self._latest_idx = 0
+        self._frame_seq = 0
+        self._consumed_seq = 0
+        self._frame_cond = threading.Condition()
+        self.reading = False
+        
         self.initialize_camera()
         
     def initialize_camera(self):
@@ -30,21 +54,72 @@ class CameraHandler:
                 self.camera.set(cv2.CAP_PROP_AUTOFOCUS, 0)
                 self.camera.set(cv2.CAP_PROP_FOCUS, self.config.get('focus', 50))
                 
+            # Держим в драйвере только самый свежий кадр
+            self.camera.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+            
             self.logger.info("Camera initialized successfully")
             
+            # Запуск потока чтения кадров
+            self.start_reader_thread()
+            
         except Exception as e:
             self.logger.error(f"Camera initialization failed: {e}")
             raise
             
+    def start_reader_thread(self):
+        """Запуск потока чтения кадров с камеры"""
+        self.reading = True
+        self.reader_thread = threading.Thread(target=self.reader_loop)
+        self.reader_thread.daemon = True
+        self.reader_thread.start()
+        
+    def reader_loop(self):
+        """Цикл чтения кадров в двойной буфер"""
+        while self.reading:
+            try:
+                if not self.camera.grab():
+                    time.sleep(0.01)
+                    continue
+                    
+                # Запись в буфер, который сейчас не отдается потребителю
+                idx = 1 - self._latest_idx
+                ret, frame = self.camera.retrieve(self._buffers[idx])
+                if not ret:
+                    continue
+                    
+                with self._frame_cond:
+                    self._buffers[idx] = frame
+                    self._latest_idx = idx
+                    self._frame_seq += 1
+                    self._frame_cond.notify_all()
+                    
+            except Exception as e:
+                self.logger.error(f"Camera reader error: {e}")
+                time.sleep(0.1)
+                
+    def wait_new_frame(self, copy=True, timeout=1.0):
+        """Ожидание кадра, новее последнего полученного"""
+        with self._frame_cond:
+            if not self._frame_cond.wait_for(
+                    lambda: self._frame_seq > self._consumed_seq, timeout=timeout):
+                return None
+                
+            self._consumed_seq = self._frame_seq
+            if not copy:
+                return True
+                
+            # Копия под блокировкой: поток чтения не перезапишет этот буфер
+            return self._buffers[self._latest_idx].copy()
+            
     def capture_frame(self):
         """Захват кадра"""
         try:
-            ret, frame = self.camera.read()
-            if not ret:
+            frame = self.wait_new_frame()
+            if frame is None:
                 self.logger.warning("Failed to capture frame")
                 return None
                 
-            # Предварительная обработка кадра
+            # Предварительная обработка только для используемых кадров
             if self.config.get('apply_preprocessing', True):
                 frame = self.preprocess_frame(frame)
                 
@@ -54,9 +129,23 @@ class CameraHandler:
             self.logger.error(f"Frame capture error: {e}")
             return None
             
+    def skip_frame(self):
+        """Пропуск кадра без копирования (блокируется до прихода кадра)"""
+        try:
+            return self.wait_new_frame(copy=False) is not None
+            
+        except Exception as e:
+            self.logger.error(f"Frame skip error: {e}")
+            return False
+            
     def preprocess_frame(self, frame):
         """Предварительная обработка кадра"""
+        source = frame
         try:
+            # Промежуточные результаты остаются в памяти устройства OpenCL
+            if self.use_opencl:
+                frame = cv2.UMat(frame)
+                
             # Коррекция экспозиции
             if self.config.get('auto_exposure', True):
                 frame = self.auto_exposure_correction(frame)
@@ -65,38 +154,49 @@ class CameraHandler:
             if self.config.get('enhance_sharpness', True):
                 frame = self.enhance_sharpness(frame)
                 
+            # Детектору и OCR нужен numpy массив
+            if isinstance(frame, cv2.UMat):
+                frame = frame.get()
+                
             return frame
             
         except Exception as e:
             self.logger.error(f"Preprocessing error: {e}")
-            return frame
+            return source
             
     def auto_exposure_correction(self, frame):
         """Автоматическая коррекция экспозиции"""
         lab = cv2.cvtColor(frame, cv2.COLOR_BGR2LAB)
-        l, a, b = cv2.split(lab)
         
-        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8))
-        l = clahe.apply(l)
+        # CLAHE только по каналу L, без split/merge всего изображения
+        # (extractChannel/insertChannel работают и с numpy, и с UMat)
+        l = self._clahe.apply(cv2.extractChannel(lab, 0))
+        lab = cv2.insertChannel(l, lab, 0)
         
-        lab = cv2.merge([l, a, b])
         result = cv2.cvtColor(lab, cv2.COLOR_LAB2BGR)
         
         return result
         
     def enhance_sharpness(self, frame):
-        """Улучшение резкости изображения"""
-        kernel = np.array([[-1,-1,-1],
-                          [-1, 9,-1],
-                          [-1,-1,-1]])
-        
-        sharpened = cv2.filter2D(frame, -1, kernel)
-        result = cv2.addWeighted(frame, 0.5, sharpened, 0.5, 0)
+        """Улучшение резкости изображения (unsharp mask)"""
+        if isinstance(frame, cv2.UMat):
+            blurred = cv2.GaussianBlur(frame, (0, 0), 1.0)
+            return cv2.addWeighted(frame, 1.5, blurred, -0.5, 0)
+            
+        if self._blur_buf is None or self._blur_buf.shape != frame.shape:
+            self._blur_buf = np.empty_like(frame)
+            
+        # Сепарабельное размытие + взвешенное вычитание, результат на месте кадра
+        cv2.GaussianBlur(frame, (0, 0), 1.0, dst=self._blur_buf)
+        cv2.addWeighted(frame, 1.5, self._blur_buf, -0.5, 0, dst=frame)
         
-        return result
+        return frame
         
     def close(self):
         """Закрытие камеры"""
+        self.reading = False
+        if hasattr(self, 'reader_thread'):
+            self.reader_thread.join(timeout=2)
         if self.camera:
             self.camera.release()
             self.logger.info("Camera closed")
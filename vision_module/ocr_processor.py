@@ -1,16 +1,55 @@
 import cv2
+import re
+import functools
 import numpy as np
 import logging
 from pathlib import Path
 
-# Импорт pytesseract с fallback
+# Импорт tesserocr (libtesseract внутри процесса) с fallback на pytesseract
 try:
-    import pytesseract
+    import tesserocr
 except ImportError:
-    pytesseract = None
-    logging.warning("pytesseract not available, OCR will not work")
+    tesserocr = None
+
+# Все, что вне армянского блока Unicode U+0530-U+058F (включая пробелы)
+_NON_ARMENIAN = re.compile('[^\u0530-\u058F]+')
+
+# Ядро морфологии создается один раз при импорте, а не на каждую область
+_MORPH2 = cv2.getStructuringElement(cv2.MORPH_RECT, (2, 2))
+
+# pytesseract импортируется при первом распознавании (ускоряет старт системы)
+pytesseract = None
+_pytesseract_checked = False
+
+def _load_pytesseract():
+    """Отложенный импорт pytesseract с fallback"""
+    global pytesseract, _pytesseract_checked
+    if not _pytesseract_checked:
+        _pytesseract_checked = True
+        try:
+            import pytesseract as module
+            pytesseract = module
+        except ImportError:
+            logging.warning("pytesseract not available, OCR will not work")
+    return pytesseract
+
+@functools.lru_cache(maxsize=1)
+def _available_langs():
+    """Список языков Tesseract (subprocess запускается один раз на процесс)"""
+    return tuple(pytesseract.get_languages())
 
 class ArmenianOCRProcessor:
+    # DPI для Tesseract: формула sqrt(площадь)/20 с ограничением 150-300 давала 150
+    # для любых областей OCR, поэтому используется константа
+    OCR_DPI = 150
+    
+    # Готовые строки конфигурации для каждого PSM режима
+    OCR_CONFIGS = {
+        6: f'--oem 1 --psm 6 --dpi {OCR_DPI} -l hye',
+        8: f'--oem 1 --psm 8 --dpi {OCR_DPI} -l hye',
+        10: f'--oem 1 --psm 10 --dpi {OCR_DPI} -l hye'
+    }
+    
     def __init__(self, config):
         self.config = config
         self.logger = logging.getLogger('ArmenianOCR')
@@ -18,6 +57,12 @@ class ArmenianOCRProcessor:
         # Конфигурация Tesseract для армянского языка
         self.base_config = '--oem 1 --psm 8 -l hye'
         
+        # Целевая высота области для OCR в пикселях
+        self.target_height = config.get('target_height', 100)
+        
+        # CLAHE создается один раз и переиспользуется для каждой области
+        self._clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8, 8))
+        
         # Нумерация слева направо, сверху вниз, начиная с 0
         self.armenian_symbols = [
             # Строка 0 (ID 0-8): Ա Բ Գ Դ Ե Զ Է Ը Թ
@@ -33,16 +78,36 @@ class ArmenianOCRProcessor:
         # Создание словаря для быстрого поиска ID символа
         self.symbol_to_id = {symbol: idx for idx, symbol in enumerate(self.armenian_symbols)}
         
-        # Проверка доступности модели
-        self.check_tesseract_model()
+        # Модель загружается в процесс один раз (если доступен tesserocr)
+        self.api = self.create_tesserocr_api()
+        
+        # Проверка доступности модели выполняется при первом распознавании
+        self.model_checked = False
+        
+    def create_tesserocr_api(self):
+        """Создание экземпляра libtesseract через tesserocr"""
+        if tesserocr is None:
+            return None
+            
+        try:
+            api = tesserocr.PyTessBaseAPI(
+                lang='hye', oem=tesserocr.OEM.LSTM_ONLY, psm=tesserocr.PSM.SINGLE_WORD
+            )
+            self.logger.info("Armenian Tesseract model loaded in-process (tesserocr)")
+            return api
+            
+        except Exception as e:
+            self.logger.error(f"Error initializing tesserocr, falling back to pytesseract: {e}")
+            return None
         
     def check_tesseract_model(self):
         """Проверка доступности модели Tesseract"""
-        if pytesseract is None:
+        self.model_checked = True
+        if self.api is not None or _load_pytesseract() is None:
             return
             
         try:
-            available_languages = pytesseract.get_languages()
+            available_languages = _available_langs()
             if 'hye' in available_languages:
                 self.logger.info("Armenian Tesseract model is available")
             else:
@@ -54,7 +119,10 @@ class ArmenianOCRProcessor:
     def recognize_armenian_text(self, image_region):
         """Распознавание армянского текста в области изображения"""
         try:
-            if pytesseract is None:
+            if not self.model_checked:
+                self.check_tesseract_model()
+                
+            if self.api is None and _load_pytesseract() is None:
                 return {'text': '', 'confidence': 0.0, 'symbol_id': None}
                 
             if image_region is None or image_region.size == 0:
@@ -63,20 +131,14 @@ class ArmenianOCRProcessor:
             # Предобработка для OCR
             processed = self.preprocess_for_ocr(image_region)
             
-            # Динамическая настройка параметров OCR
-            config = self.get_dynamic_config(processed)
-            
             # OCR распознавание
-            text = pytesseract.image_to_string(processed, config=config)
-            
-            # Получение данных с confidence
-            data = pytesseract.image_to_data(
-                processed, config=config, output_type=pytesseract.Output.DICT
-            )
+            if self.api is not None:
+                text, confidences = self.run_tesserocr(processed)
+            else:
+                text, confidences = self.run_pytesseract(processed)
             
             # Расчет среднего confidence
-            confidences = [int(conf) for conf in data['conf'] if int(conf) > 0]
-            avg_confidence = np.mean(confidences) if confidences else 0
+            avg_confidence = sum(confidences) / len(confidences) if confidences else 0.0
             
             # Очистка и валидация текста
             cleaned_text = self.clean_armenian_text(text)
@@ -102,70 +164,90 @@ class ArmenianOCRProcessor:
             self.logger.error(f"OCR processing error: {e}")
             return {'text': '', 'confidence': 0.0, 'symbol_id': None, 'error': str(e)}
             
+    def run_tesserocr(self, processed):
+        """OCR через libtesseract в процессе, без subprocess и временных файлов"""
+        height, width = processed.shape
+        
+        self.api.SetPageSegMode(self.select_psm(processed))
+        self.api.SetImageBytes(processed.tobytes(), width, height, 1, width)
+        self.api.SetSourceResolution(self.OCR_DPI)
+        
+        text = self.api.GetUTF8Text()
+        confidences = [conf for conf in self.api.AllWordConfidences() if conf > 0]
+        
+        return text, confidences
+        
+    def run_pytesseract(self, processed):
+        """OCR через pytesseract: один вызов дает и текст, и confidence"""
+        config = self.get_dynamic_config(processed)
+        
+        data = pytesseract.image_to_data(
+            processed, config=config, output_type=pytesseract.Output.DICT
+        )
+        
+        # Одно преобразование confidence (строки или float в зависимости от версии)
+        conf = np.asarray(data['conf'], dtype=np.float64).astype(np.int32)
+        valid = conf > 0
+        
+        # Текст собирается из распознанных слов
+        text = ' '.join(word for word, ok in zip(data['text'], valid) if ok)
+        confidences = conf[valid].tolist()
+        
+        return text, confidences
+        
+    def recognize_batch(self, image_regions):
+        """Распознавание списка областей одного кадра"""
+        # Tesseract не принимает пачки изображений - распознаем по одному
+        return [self.recognize_armenian_text(region) for region in image_regions]
+        
     def preprocess_for_ocr(self, image):
         """Предобработка изображения для OCR"""
-        # Конвертация в оттенки серого
-        if len(image.shape) == 3:
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        else:
-            gray = image.copy()
-            
-        # Масштабирование для улучшения качества OCR (символы 3x3м)
-        scale_factor = 4
+        # Конвертация в оттенки серого (копия не нужна - resize создает новый массив)
+        gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        
+        # Масштабирование к целевой высоте символа для LSTM Tesseract (символы 3x3м)
         height, width = gray.shape
-        scaled = cv2.resize(gray, (width * scale_factor, height * scale_factor), 
-                          interpolation=cv2.INTER_CUBIC)
+        scale = self.target_height / height
+        new_width = max(1, int(round(width * scale)))
+        interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR
+        scaled = cv2.resize(gray, (new_width, self.target_height), 
+                          interpolation=interpolation)
         
         # Повышение контраста
-        clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8, 8))
-        contrast_enhanced = clahe.apply(scaled)
+        contrast_enhanced = self._clahe.apply(scaled)
         
         # Бинаризация (черные символы на белом фоне)
         _, binary = cv2.threshold(contrast_enhanced, 0, 255, 
                                  cv2.THRESH_BINARY + cv2.THRESH_OTSU)
         
         # Морфологические операции для очистки
-        kernel = np.ones((2, 2), np.uint8)
-        cleaned = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, kernel)
+        cleaned = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, _MORPH2)
         
         return cleaned
         
-    def get_dynamic_config(self, processed_image):
-        """Динамическая настройка конфигурации OCR"""
+    def select_psm(self, processed_image):
+        """Выбор PSM режима по размеру области"""
         height, width = processed_image.shape
         
         # Выбор PSM режима в зависимости от размера
         if width * height > 100000:  # Большая область
-            psm = 6  # Единый блок текста
+            return 6  # Единый блок текста
         elif width * height > 20000:  # Средняя область
-            psm = 8  # Одно слово
+            return 8  # Одно слово
         else:  # Маленькая область
-            psm = 10  # Один символ
+            return 10  # Один символ
             
-        # Настройка DPI для больших символов
-        dpi = min(300, max(150, int(np.sqrt(width * height) / 20)))
-        
-        config = f'--oem 1 --psm {psm} --dpi {dpi} -l hye'
-        
-        return config
+    def get_dynamic_config(self, processed_image):
+        """Динамическая настройка конфигурации OCR"""
+        return self.OCR_CONFIGS[self.select_psm(processed_image)]
         
     def clean_armenian_text(self, text):
         """Очистка и валидация армянского текста"""
         if not text:
             return ""
             
-        # Удаление лишних пробелов и переносов строк
-        cleaned = text.strip().replace('\n', ' ').replace('\r', '')
-        cleaned = ' '.join(cleaned.split())
-        
-        # Фильтрация только армянских символов
-        armenian_chars = []
-        for char in cleaned:
-            # Армянские символы: U+0530-U+058F
-            if '\u0530' <= char <= '\u058F':
-                armenian_chars.append(char)
-                
-        result = ''.join(armenian_chars).strip()
+        # Фильтрация только армянских символов (пробелы и переносы тоже удаляются)
+        result = _NON_ARMENIAN.sub('', text)
         return result
         
     def get_symbol_id(self, symbol_text):
@@ -184,4 +266,9 @@ class ArmenianOCRProcessor:
             self.logger.warning(f"Symbol '{first_symbol}' not found in competition table")
             
         return symbol_id
-
+        
+    def close(self):
+        """Освобождение libtesseract"""
+        if self.api is not None:
+            self.api.End()
+            self.api = None
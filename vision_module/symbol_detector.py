@@ -2,6 +2,10 @@ import cv2
 import numpy as np
 import logging
 
+# Ядра морфологии создаются один раз при импорте, а не на каждый кадр
+_MORPH2 = cv2.getStructuringElement(cv2.MORPH_RECT, (2, 2))
+_MORPH3 = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
+
 class SymbolDetector:
     def __init__(self, config):
         self.config = config
@@ -11,29 +15,51 @@ class SymbolDetector:
         self.min_symbol_area = config.get('min_symbol_area', 2000)
         self.max_symbol_area = config.get('max_symbol_area', 100000)
         
+        # Масштаб бинарной маски для морфологии и поиска контуров
+        self.detection_scale = config.get('detection_scale', 0.5)
+        
+        # Масштаб грубого прохода для поиска областей-кандидатов
+        self.coarse_scale = config.get('coarse_scale', 0.25)
+        
     def detect_symbols(self, frame):
-        """Детекция потенциальных символов на кадре"""
+        """Детекция потенциальных символов на кадре
+        
+        Возвращает список детекций и кадр в оттенках серого, чтобы OCR
+        не выполнял повторную конвертацию цвета для каждой области.
+        """
         try:
-            # Предобработка для детекции
-            processed = self.preprocess_for_detection(frame)
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
             
-            # Поиск контуров
-            contours = self.find_symbol_contours(processed)
+            # Грубый проход: области, где могут быть символы
+            rois = self.find_candidate_rois(gray)
             
-            # Фильтрация и анализ контуров
-            detections = self.analyze_contours(contours, frame.shape)
+            # Точный проход только по найденным областям
+            all_stats = []
+            for x1, y1, x2, y2 in rois:
+                processed = self.preprocess_for_detection(gray[y1:y2, x1:x2])
+                
+                # Поиск связных компонент (bbox и площадь за один проход)
+                stats = self.find_symbol_components(processed)
+                stats[:, 0] += x1
+                stats[:, 1] += y1
+                all_stats.append(stats)
+                
+            stats = np.concatenate(all_stats) if all_stats else np.empty((0, 5))
+            
+            # Фильтрация и анализ компонент
+            detections = self.analyze_components(stats, frame.shape)
             
             self.logger.debug(f"Found {len(detections)} potential symbols")
-            return detections
+            return detections, gray
             
         except Exception as e:
             self.logger.error(f"Symbol detection error: {e}")
-            return []
+            return [], None
             
     def preprocess_for_detection(self, frame):
-        """Предобработка кадра для детекции символов"""
+        """Предобработка кадра (или его области) для детекции символов"""
         # Конвертация в оттенки серого
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        gray = frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
         
         # Размытие для уменьшения шума
         blurred = cv2.GaussianBlur(gray, (5, 5), 0)
@@ -44,75 +70,173 @@ class SymbolDetector:
             cv2.THRESH_BINARY_INV, 11, 2  # INV для черных символов на белом фоне
         )
         
-        # Морфологические операции
-        kernel = np.ones((3, 3), np.uint8)
-        opened = cv2.morphologyEx(thresh, cv2.MORPH_OPEN, kernel, iterations=1)
-        closed = cv2.morphologyEx(opened, cv2.MORPH_CLOSE, kernel, iterations=2)
+        # Уменьшение маски: площадь символов позволяет работать в 1/2 разрешения
+        if self.detection_scale != 1.0:
+            thresh = cv2.resize(thresh, None, fx=self.detection_scale, fy=self.detection_scale,
+                                interpolation=cv2.INTER_NEAREST)
+            
+        # Морфологические операции: открытие удаляет шум сенсора (без него шум
+        # сливается в одну компоненту размером с фон), затем замыкание.
+        # Ядро 2x2 в уменьшенной маске соответствует 3x3-4x4 исходного кадра
+        open_kernel = _MORPH2 if self.detection_scale < 1.0 else _MORPH3
+        opened = cv2.morphologyEx(thresh, cv2.MORPH_OPEN, open_kernel)
+        closed = cv2.morphologyEx(opened, cv2.MORPH_CLOSE, _MORPH3, iterations=2)
         
         return closed
         
-    def find_symbol_contours(self, processed_frame):
-        """Поиск контуров потенциальных символов"""
-        contours, _ = cv2.findContours(
-            processed_frame, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE
+    def find_candidate_rois(self, gray):
+        """Грубый поиск областей-кандидатов на уменьшенном кадре"""
+        height, width = gray.shape
+        scale = self.coarse_scale
+        inv_scale = 1.0 / scale
+        
+        small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        thresh = cv2.adaptiveThreshold(
+            small, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 
+            cv2.THRESH_BINARY_INV, 11, 2
         )
-        return contours
+        # Открытие убирает шум, иначе области-кандидаты покрывают весь кадр
+        opened = cv2.morphologyEx(thresh, cv2.MORPH_OPEN, _MORPH2)
+        closed = cv2.morphologyEx(opened, cv2.MORPH_CLOSE, _MORPH3, iterations=1)
+        _, _, stats, _ = cv2.connectedComponentsWithStats(closed, connectivity=8)
+        stats = stats[1:]
         
-    def analyze_contours(self, contours, frame_shape):
-        """Анализ контуров и создание детекций"""
-        detections = []
+        # Мягкий фильтр по размеру: окончательная проверка - в точном проходе
+        # (по площади рамки, как и в analyze_components)
+        bbox_areas = stats[:, cv2.CC_STAT_WIDTH] * stats[:, cv2.CC_STAT_HEIGHT] * inv_scale ** 2
+        keep = (bbox_areas >= self.min_symbol_area * 0.25) & (bbox_areas <= self.max_symbol_area * 4)
         
-        for contour in contours:
-            area = cv2.contourArea(contour)
+        # Перевод в координаты кадра с запасом на границе для фильтров точного прохода
+        padding = 16
+        rois = []
+        for x, y, w, h in stats[keep, :4]:
+            rois.append([
+                max(0, int(x * inv_scale) - padding),
+                max(0, int(y * inv_scale) - padding),
+                min(width, int((x + w) * inv_scale) + padding),
+                min(height, int((y + h) * inv_scale) + padding)
+            ])
             
-            # Фильтрация по размеру (символы 3x3 метра)
-            if area < self.min_symbol_area or area > self.max_symbol_area:
-                continue
-                
-            # Ограничивающий прямоугольник
-            x, y, w, h = cv2.boundingRect(contour)
+        rois = self.merge_rois(rois)
+        
+        # При большом покрытии дешевле обработать кадр целиком
+        covered = sum((x2 - x1) * (y2 - y1) for x1, y1, x2, y2 in rois)
+        if covered > 0.5 * width * height:
+            return [(0, 0, width, height)]
             
-            # Проверка пропорций (символы должны быть примерно квадратными)
-            aspect_ratio = w / h
-            if aspect_ratio < 0.4 or aspect_ratio > 2.5:
-                continue
-                
-            # Проверка заполненности контура
-            contour_area = cv2.contourArea(contour)
-            bbox_area = w * h
-            fill_ratio = contour_area / bbox_area
+        return rois
+        
+    def merge_rois(self, rois):
+        """Объединение пересекающихся областей, чтобы символы не обрабатывались дважды"""
+        merged = True
+        while merged:
+            merged = False
+            result = []
+            for roi in rois:
+                for other in result:
+                    if (roi[0] < other[2] and other[0] < roi[2] and
+                            roi[1] < other[3] and other[1] < roi[3]):
+                        other[0] = min(other[0], roi[0])
+                        other[1] = min(other[1], roi[1])
+                        other[2] = max(other[2], roi[2])
+                        other[3] = max(other[3], roi[3])
+                        merged = True
+                        break
+                else:
+                    result.append(roi)
+            rois = result
             
-            if fill_ratio < 0.1 or fill_ratio > 0.9:
-                continue
-                
-            # Создание детекции
-            detection = {
-                'bbox': (x, y, w, h),
-                'area': area,
-                'aspect_ratio': aspect_ratio,
-                'fill_ratio': fill_ratio,
-                'confidence': self.calculate_detection_confidence(
-                    area, aspect_ratio, fill_ratio
-                )
-            }
+        return [tuple(roi) for roi in rois]
+        
+    def find_symbol_components(self, processed_frame):
+        """Поиск связных компонент потенциальных символов"""
+        _, _, stats, _ = cv2.connectedComponentsWithStats(processed_frame, connectivity=8)
+        
+        # Строка 0 - фон
+        stats = stats[1:].astype(np.float64)
+        
+        # Пересчет в координаты области до уменьшения маски
+        if self.detection_scale != 1.0:
+            inv_scale = 1.0 / self.detection_scale
+            stats[:, :4] = np.rint(stats[:, :4] * inv_scale)
+            stats[:, cv2.CC_STAT_AREA] *= inv_scale * inv_scale
             
-            detections.append(detection)
+        return stats
+        
+    def analyze_components(self, stats, frame_shape):
+        """Анализ компонент и создание детекций"""
+        if len(stats) == 0:
+            return []
             
+        # Признаки всех компонент в виде массивов (SoA), координаты кадра
+        bboxes = stats[:, :4].astype(np.int32)
+        areas = stats[:, cv2.CC_STAT_AREA]
+        
+        widths = bboxes[:, 2]
+        heights = bboxes[:, 3]
+        
+        # Пропорции (символы должны быть примерно квадратными)
+        aspect_ratios = widths / heights
+        
+        # Площадь ограничивающего прямоугольника: пороги min/max_symbol_area
+        # подбирались под площадь внешнего контура, а не под число пикселей штриха
+        bbox_areas = widths * heights
+        
+        # Заполненность ограничивающего прямоугольника
+        fill_ratios = areas / bbox_areas
+        
+        # Фильтрация по размеру (символы 3x3 метра), пропорциям и заполненности
+        mask = ((bbox_areas >= self.min_symbol_area) & (bbox_areas <= self.max_symbol_area) &
+                (aspect_ratios >= 0.4) & (aspect_ratios <= 2.5) &
+                (fill_ratios >= 0.1) & (fill_ratios <= 0.9))
+        
+        bboxes = bboxes[mask]
+        bbox_areas = bbox_areas[mask]
+        aspect_ratios = aspect_ratios[mask]
+        fill_ratios = fill_ratios[mask]
+        
+        # Внутренние кольца (контуры отверстий букв) лежат внутри рамки символа;
+        # оставляем только внешние компоненты (аналог RETR_EXTERNAL)
+        x1, y1 = bboxes[:, 0], bboxes[:, 1]
+        x2, y2 = x1 + bboxes[:, 2], y1 + bboxes[:, 3]
+        inside = ((x1[:, None] >= x1) & (y1[:, None] >= y1) &
+                  (x2[:, None] <= x2) & (y2[:, None] <= y2) &
+                  (bbox_areas[:, None] < bbox_areas))
+        outer = ~inside.any(axis=1)
+        
+        bboxes = bboxes[outer]
+        bbox_areas = bbox_areas[outer]
+        aspect_ratios = aspect_ratios[outer]
+        fill_ratios = fill_ratios[outer]
+        confidences = self.calculate_detection_confidence(bbox_areas, aspect_ratios, fill_ratios)
+        
         # Сортировка по уверенности
-        detections.sort(key=lambda x: x['confidence'], reverse=True)
+        order = np.argsort(-confidences, kind='stable')
+        
+        # Словари создаются только для прошедших фильтр детекций
+        detections = [
+            {
+                'bbox': tuple(bboxes[i].tolist()),
+                'area': float(bbox_areas[i]),
+                'aspect_ratio': float(aspect_ratios[i]),
+                'fill_ratio': float(fill_ratios[i]),
+                'confidence': float(confidences[i])
+            }
+            for i in order
+        ]
         
         return detections
         
     def calculate_detection_confidence(self, area, aspect_ratio, fill_ratio):
-        """Расчет уверенности детекции"""
+        """Расчет уверенности детекции (скаляры или массивы numpy)"""
         # Нормализация для символов 3x3 метра
-        area_score = min(area / 20000, 1.0)  
+        area_score = np.minimum(area / 20000, 1.0)  
         
         # Предпочтение квадратных символов
-        ratio_score = 1.0 - abs(1.0 - aspect_ratio) if aspect_ratio <= 2.0 else 0.5
+        ratio_score = np.where(aspect_ratio <= 2.0, 1.0 - np.abs(1.0 - aspect_ratio), 0.5)
         
         # Предпочтение хорошо заполненных контуров
-        fill_score = fill_ratio if fill_ratio <= 0.6 else 1.0 - fill_ratio
+        fill_score = np.where(fill_ratio <= 0.6, fill_ratio, 1.0 - fill_ratio)
         
         confidence = (area_score + ratio_score + fill_score) / 3.0
         return confidence